@@ -1,13 +1,14 @@
 import streamlit as st
-import os
 from pathlib import Path
-import pandas as pd
-from datetime import datetime
+import csv
+from collections import Counter
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 import io
-import pytz
-import base64
-from pygame import mixer
-import time
+import hashlib
+import tempfile
+import bisect
+import re
 
 # Set page configuration
 st.set_page_config(
@@ -17,19 +18,62 @@ st.set_page_config(
 )
 
 # Initialize session state
-if 'audio_files' not in st.session_state:
-    st.session_state.audio_files = {}
+if 'audio_clips' not in st.session_state:
+    # Parallel columns kept in play order so the grid reads them sequentially
+    st.session_state.audio_clips = {
+        "sort_keys": [],
+        "names": [],
+        "paths": [],
+        "labels": [],
+        "display_labels": [],
+        "widget_keys": []
+    }
 if 'call_log' not in st.session_state:
-    st.session_state.call_log = []
-if 'current_audio' not in st.session_state:
-    st.session_state.current_audio = None
-if 'audio_states' not in st.session_state:
-    st.session_state.audio_states = {}
+    # Column-oriented so the Arrow table wraps each list instead of parsing row dicts
+    st.session_state.call_log = {
+        "timestamp": [],
+        "business": [],
+        "notes": [],
+        "result": [],
+        "reason": []
+    }
+if 'call_stats' not in st.session_state:
+    # Running aggregates updated by log_call so statistics never rescan the log
+    st.session_state.call_stats = {
+        "total": 0,
+        "interested": 0,
+        "rejected": 0,
+        "reasons": Counter(),
+        "first_ts": None,
+        "last_ts": None
+    }
+if 'exports' not in st.session_state:
+    st.session_state.exports = {}
 
 # Define PST timezone
-pst = pytz.timezone('America/Los_Angeles')
+pst = ZoneInfo('America/Los_Angeles')
+
+# Directory uploaded audio clips are saved to
+UPLOAD_DIR = Path("uploads")
+
+# Digit runs in clip filenames, used to order the play buttons
+DIGITS_RE = re.compile(r'\d+')
 
-st.markdown("""
+# Call logger choices for the form radios
+RESULT_OPTIONS = ('Interested', 'Rejected')
+REASON_OPTIONS = ('No answer', 'Owner not there', 'Not Interested', 'N/A')
+
+# Column headers for the call log table
+CALL_LOG_COLUMNS = {
+    "timestamp": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm:ss"),
+    "business": "Business",
+    "result": "Result",
+    "reason": "Reason",
+    "notes": "Notes"
+}
+
+# App styling, injected on every run since Streamlit drops elements a rerun doesn't re-emit
+CSS = """
     <style>
     /* Main container styling */
     .main {
@@ -128,36 +172,188 @@ st.markdown("""
         justify-content: center !important;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+st.markdown(CSS, unsafe_allow_html=True)
+
+def save_uploaded_file(uploaded_file):
+    """Write an uploaded audio file to disk under its content hash and return its path"""
+    # getbuffer() exposes the upload without copying it into a new bytes object
+    buffer = uploaded_file.getbuffer()
+    digest = hashlib.blake2b(buffer, digest_size=16).hexdigest()
+    audio_path = UPLOAD_DIR / f"{digest}{Path(uploaded_file.name).suffix}"
+    # Identical clips share a file, so only new content is written
+    if not audio_path.exists():
+        # Other sessions may read the shared file, so it only appears once fully written
+        tmp = tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False)
+        try:
+            with tmp:
+                tmp.write(buffer)
+            Path(tmp.name).replace(audio_path)
+        except BaseException:
+            Path(tmp.name).unlink(missing_ok=True)
+            raise
+    return audio_path
+
+def audio_sort_key(filename):
+    """Numeric sort key from the first run of digits in the filename stem"""
+    match = DIGITS_RE.search(Path(filename).stem)
+    return int(match.group()) if match else 999
 
 def save_uploaded_files(uploaded_files):
-    """Save multiple uploaded audio files"""
-    for uploaded_file in uploaded_files:
-        if uploaded_file.type == 'audio/mpeg':
-            st.session_state.audio_files[uploaded_file.name] = uploaded_file
+    """Save multiple uploaded audio files to disk and remember their paths"""
+    mp3_files = [f for f in uploaded_files if f.type == 'audio/mpeg']
+    if not mp3_files:
+        return
+    
+    UPLOAD_DIR.mkdir(exist_ok=True)
+    clips = st.session_state.audio_clips
+    for uploaded_file in mp3_files:
+        filename = uploaded_file.name
+        # Paths are content hashes, so an unchanged clip maps to the file it already has
+        audio_path = str(save_uploaded_file(uploaded_file))
+        if filename in clips["names"]:
+            idx = clips["names"].index(filename)
+            if clips["paths"][idx] == audio_path:
+                continue
+            for column in clips.values():
+                del column[idx]
+        
+        # Work out the button labels once instead of on every render
+        button_label = Path(filename).stem
+        # Truncate long names
+        if len(button_label) > 20:
+            display_label = button_label[:17] + "..."
+        else:
+            display_label = button_label
+        
+        sort_key = (audio_sort_key(filename), filename)
+        idx = bisect.bisect(clips["sort_keys"], sort_key)
+        clips["sort_keys"].insert(idx, sort_key)
+        clips["names"].insert(idx, filename)
+        clips["paths"].insert(idx, audio_path)
+        clips["labels"].insert(idx, button_label)
+        clips["display_labels"].insert(idx, f"🎵\n{display_label}")
+        clips["widget_keys"].insert(idx, f"btn_{filename}")
+
+# Shared by every session, so cap it; evicted clips are just read from disk again
+@st.cache_resource(max_entries=32)
+def load_audio(path):
+    """Read an audio clip once per process and reuse the bytes across reruns"""
+    return Path(path).read_bytes()
 
 def log_call(business_name, notes, result, reason):
     """Add a new call to the call log with PST timestamp"""
-    timestamp = datetime.now(pst).strftime("%Y-%m-%d %H:%M:%S")
-    st.session_state.call_log.append({
-        "timestamp": timestamp,
-        "business": business_name,
-        "notes": notes,
-        "result": result,
-        "reason": reason
-    })
+    # Keep the aware datetime and only format it for display and export
+    now = datetime.now(pst).replace(microsecond=0)
+    call_log = st.session_state.call_log
+    call_log["timestamp"].append(now)
+    call_log["business"].append(business_name)
+    call_log["notes"].append(notes)
+    call_log["result"].append(result)
+    call_log["reason"].append(reason)
+    
+    # Keep the aggregates current so statistics never rescan the log
+    call_stats = st.session_state.call_stats
+    call_stats["total"] += 1
+    call_stats["interested"] += result == 'Interested'
+    call_stats["rejected"] += result == 'Rejected'
+    call_stats["reasons"][reason] += 1
+    call_stats["first_ts"] = call_stats["first_ts"] or now
+    call_stats["last_ts"] = now
+
+def submit_call_form():
+    """Log the submitted call, clearing the form only once the call is logged"""
+    business_name = st.session_state.call_business
+    st.session_state.call_logged = bool(business_name)
+    if not business_name:
+        # Keep the other inputs so the user only has to add the name
+        return
+    
+    log_call(
+        business_name,
+        st.session_state.call_notes,
+        st.session_state.call_result,
+        st.session_state.call_reason
+    )
+    st.session_state.call_business = ""
+    st.session_state.call_notes = ""
+    st.session_state.call_result = RESULT_OPTIONS[0]
+    st.session_state.call_reason = REASON_OPTIONS[0]
+
+@st.cache_resource
+def call_log_schema():
+    """Arrow schema for the call log, with result/reason dictionary-encoded"""
+    # pyarrow is imported on first use so sessions that only play audio skip it
+    import pyarrow as pa
+    return pa.schema([
+        ("timestamp", pa.timestamp('s', tz=pst.key)),
+        ("business", pa.string()),
+        ("notes", pa.string()),
+        ("result", pa.dictionary(pa.int8(), pa.string())),
+        ("reason", pa.dictionary(pa.int8(), pa.string()))
+    ])
 
-def calculate_statistics(df):
-    """Calculate call statistics including time-based metrics in PST"""
-    total_calls = len(df)
+def call_log_table():
+    """Return the call log as an Arrow table, rebuilding it only after a call is logged"""
+    call_log = st.session_state.call_log
+    call_count = len(call_log["timestamp"])
+    if st.session_state.get('_cached_n') != call_count:
+        import pyarrow as pa
+        st.session_state['_cached_table'] = pa.Table.from_pydict(call_log, schema=call_log_schema())
+        st.session_state['_cached_n'] = call_count
+    return st.session_state['_cached_table']
+
+@st.cache_data(max_entries=4)
+def call_log_csv(call_log):
+    """Encode the call log columns as CSV bytes with the stdlib csv writer"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n', quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(call_log.keys())
+    # Format every timestamp in one vectorized pass rather than per row
+    timestamps = pc.strftime(
+        pa.array(call_log["timestamp"], type=call_log_schema().field("timestamp").type),
+        format="%Y-%m-%d %H:%M:%S"
+    )
+    writer.writerows(zip(
+        timestamps.to_pylist(),
+        call_log["business"],
+        call_log["notes"],
+        call_log["result"],
+        call_log["reason"]
+    ))
+    return buffer.getvalue().encode('utf-8')
+
+@st.cache_data(max_entries=4)
+def call_log_parquet(call_log):
+    """Encode the call log columns as snappy-compressed Parquet bytes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    buffer = io.BytesIO()
+    pq.write_table(
+        pa.Table.from_pydict(call_log, schema=call_log_schema()),
+        buffer,
+        compression='snappy'
+    )
+    return buffer.getvalue()
+
+def calculate_statistics():
+    """Calculate call statistics from the running counters kept by log_call"""
+    call_stats = st.session_state.call_stats
+    total_calls = call_stats["total"]
     if total_calls == 0:
         return None
     
-    # Convert timestamp strings to datetime objects in PST
-    df['datetime'] = pd.to_datetime(df['timestamp']).dt.tz_localize(pst)
-    
-    # Calculate time-based metrics
-    time_diff = df['datetime'].max() - df['datetime'].min()
+    # Calculate time-based metrics on UTC instants; subtracting two times that
+    # share the zone object compares wall clocks and breaks across DST changes
+    time_diff = (
+        call_stats["last_ts"].astimezone(timezone.utc)
+        - call_stats["first_ts"].astimezone(timezone.utc)
+    )
     total_hours = time_diff.total_seconds() / 3600
     calls_per_hour = total_calls / total_hours if total_hours > 0 else total_calls
     
@@ -165,15 +361,12 @@ def calculate_statistics(df):
     hours = int(time_diff.total_seconds() // 3600)
     minutes = int((time_diff.total_seconds() % 3600) // 60)
     
-    # Calculate percentages
-    interested_pct = (df['result'] == 'Interested').mean() * 100
-    rejected_pct = (df['result'] == 'Rejected').mean() * 100
-    
-    # Calculate reason percentages
-    reason_counts = df['reason'].value_counts()
+    # Calculate percentages from the counters
+    interested_pct = call_stats["interested"] / total_calls * 100
+    rejected_pct = call_stats["rejected"] / total_calls * 100
     reason_pcts = {
         reason: (count / total_calls * 100)
-        for reason, count in reason_counts.items()
+        for reason, count in call_stats["reasons"].most_common()
     }
     
     stats = {
@@ -184,169 +377,184 @@ def calculate_statistics(df):
         'duration_hours': hours,
         'duration_minutes': minutes,
         'calls_per_hour': calls_per_hour,
-        'start_time': df['datetime'].min().strftime('%I:%M %p PST'),
-        'end_time': df['datetime'].max().strftime('%I:%M %p PST')
+        'start_time': call_stats["first_ts"].strftime('%I:%M %p PST'),
+        'end_time': call_stats["last_ts"].strftime('%I:%M %p PST')
     }
     
     return stats
 
+@st.cache_data(max_entries=8)
 def create_report_text(stats, date):
     """Create a text report with statistics including time metrics"""
-    report = f"""Cold Calling Report - {date}
-{'='*50}
-
-TIME STATISTICS
---------------
-Session Duration: {stats['duration_hours']} hours, {stats['duration_minutes']} minutes
-Start Time: {stats['start_time']}
-End Time: {stats['end_time']}
-Calls Per Hour: {stats['calls_per_hour']:.1f}
-
-CALL STATISTICS SUMMARY
-----------------------
-Total Calls: {stats['total_calls']}
-Interested: {stats['interested_pct']:.1f}%
-Rejected: {stats['rejected_pct']:.1f}%
+    lines = [
+        f"Cold Calling Report - {date}",
+        "=" * 50,
+        "",
+        "TIME STATISTICS",
+        "-" * 14,
+        f"Session Duration: {stats['duration_hours']} hours, {stats['duration_minutes']} minutes",
+        f"Start Time: {stats['start_time']}",
+        f"End Time: {stats['end_time']}",
+        f"Calls Per Hour: {stats['calls_per_hour']:.1f}",
+        "",
+        "CALL STATISTICS SUMMARY",
+        "-" * 22,
+        f"Total Calls: {stats['total_calls']}",
+        f"Interested: {stats['interested_pct']:.1f}%",
+        f"Rejected: {stats['rejected_pct']:.1f}%",
+        "",
+        "REASON BREAKDOWN",
+        "-" * 14
+    ]
+    lines += [f"{reason}: {pct:.1f}%" for reason, pct in stats['reason_pcts'].items()]
+    
+    return "\n".join(lines)
 
-REASON BREAKDOWN
---------------"""
+@st.fragment
+def export_section(stats, date):
+    """Render export downloads, serializing the files only once requested"""
+    if not st.toggle("Prepare downloads", key="prepare_exports"):
+        return
     
-    for reason, pct in stats['reason_pcts'].items():
-        report += f"\n{reason}: {pct:.1f}%"
+    # Reuse the prepared files until a new call is logged
+    exports = st.session_state.exports
+    export_key = (stats['total_calls'], date)
+    if exports.get('key') != export_key:
+        exports.clear()
+        exports['key'] = export_key
+        exports['parquet'] = call_log_parquet(st.session_state.call_log)
+        exports['csv'] = call_log_csv(st.session_state.call_log)
+        exports['report'] = create_report_text(stats, date).encode('utf-8')
     
-    return report
-
-# Main app layout
-st.title("Cold Calling Assistant 📞")
-
-# Create two columns for the main layout
-col1, col2 = st.columns([2, 1])
-
-with col1:
-    st.header("Audio Controls")
+    col1, col2, col3 = st.columns(3)
     
-    # Multiple file upload section
-    uploaded_files = st.file_uploader(
-        "Drop all your audio files here",
-        type=['mp3'],
-        accept_multiple_files=True,
-        key="file_uploader"
-    )
+    # Parquet Export
+    with col1:
+        parquet_filename = f"call_log_{date}.parquet"
+        st.download_button(
+            label="Download Call Log (Parquet)",
+            data=exports['parquet'],
+            file_name=parquet_filename,
+            mime="application/octet-stream"
+        )
     
-    if uploaded_files:
-        save_uploaded_files(uploaded_files)
+    # CSV Export
+    with col2:
+        csv_filename = f"call_log_{date}.csv"
+        st.download_button(
+            label="Download Call Log (CSV)",
+            data=exports['csv'],
+            file_name=csv_filename,
+            mime="text/csv"
+        )
     
-    # Audio playback section
+    # Text Report Export
+    with col3:
+        report_filename = f"call_report_{date}.txt"
+        st.download_button(
+            label="Download Report (TXT)",
+            data=exports['report'],
+            file_name=report_filename,
+            mime="text/plain"
+        )
+
+@st.fragment
+def audio_grid():
+    """Render the clip buttons; a click reruns only this fragment"""
     st.subheader("Play Audio Clips")
-    if st.session_state.audio_files:
-        # Sort files numerically
-        sorted_files = sorted(st.session_state.audio_files.items(), 
-                            key=lambda x: int(''.join(filter(str.isdigit, x[0]))) if any(c.isdigit() for c in x[0]) else 999)
-        
-        # Split files into two lists for left and right columns
-        total_files = len(sorted_files)
-        mid_point = (total_files + 1) // 2
+    clips = st.session_state.audio_clips
+    if clips["names"]:
+        # Split point between the left and right columns
+        mid_point = (len(clips["names"]) + 1) // 2
         
         # Create columns for the 2-column grid layout
-        left_col, right_col = st.columns(2)
+        columns = st.columns(2)
         
-        # Left column (first half of numbers)
-        with left_col:
-            for filename, audio_file in sorted_files[:mid_point]:
+        # Clips are kept sorted numerically as they are added: first half
+        # on the left, second half on the right
+        for idx, (audio_path, button_label, display_label, widget_key) in enumerate(zip(
+            clips["paths"], clips["labels"], clips["display_labels"], clips["widget_keys"]
+        )):
+            with columns[0 if idx < mid_point else 1]:
                 # Create a container for each button and its audio player
                 button_container = st.container()
                 
                 with button_container:
-                    button_label = os.path.splitext(filename)[0]
-                    # Truncate long names
-                    if len(button_label) > 20:
-                        display_label = button_label[:17] + "..."
-                    else:
-                        display_label = button_label
-                    
-                    if st.button(
-                        f"🎵\n{display_label}",
-                        key=f"btn_{filename}",
-                        help=button_label
-                    ):
-                        # Reset file pointer
-                        audio_file.seek(0)
+                    if st.button(display_label, key=widget_key, help=button_label):
                         # Show audio player under this button
-                        st.audio(audio_file, format='audio/mp3')
-        
-        # Right column (second half of numbers)
-        with right_col:
-            for filename, audio_file in sorted_files[mid_point:]:
-                # Create a container for each button and its audio player
-                button_container = st.container()
-                
-                with button_container:
-                    button_label = os.path.splitext(filename)[0]
-                    # Truncate long names
-                    if len(button_label) > 20:
-                        display_label = button_label[:17] + "..."
-                    else:
-                        display_label = button_label
-                    
-                    if st.button(
-                        f"🎵\n{display_label}",
-                        key=f"btn_{filename}",
-                        help=button_label
-                    ):
-                        # Reset file pointer
-                        audio_file.seek(0)
-                        # Show audio player under this button
-                        st.audio(audio_file, format='audio/mp3')
+                        st.audio(load_audio(audio_path), format='audio/mp3')
     else:
         st.info("👆 Drop your audio files above to get started!")
+
+# Main app layout
+st.title("Cold Calling Assistant 📞")
+
+# Create two columns for the main layout
+col1, col2 = st.columns([2, 1])
+
+with col1:
+    st.header("Audio Controls")
+    
+    # Multiple file upload section, batched in a form so it only reruns on submit
+    with st.form("upload_form", clear_on_submit=True):
+        uploaded_files = st.file_uploader(
+            "Drop all your audio files here",
+            type=['mp3'],
+            accept_multiple_files=True,
+            key="file_uploader"
+        )
+        
+        clips_submitted = st.form_submit_button("Add Audio Clips 🎵")
+    
+    if clips_submitted and uploaded_files:
+        save_uploaded_files(uploaded_files)
+    
+    # Audio playback section
+    audio_grid()
         
 with col2:
     st.header("Call Logger")
     
     # Call logging form
     with st.form("call_log_form"):
-        business_name = st.text_input("Business Name", placeholder="Enter business name")
+        st.text_input("Business Name", placeholder="Enter business name", key="call_business")
         
         # Radio buttons for Result
-        result = st.radio(
+        st.radio(
             "Call Result",
-            options=['Interested', 'Rejected'],
-            horizontal=True
+            options=RESULT_OPTIONS,
+            horizontal=True,
+            key="call_result"
         )
         
         # Radio buttons for Reason
-        reason = st.radio(
+        st.radio(
             "Reason",
-            options=['No answer', 'Owner not there', 'Not Interested', 'N/A'],
-            horizontal=True
+            options=REASON_OPTIONS,
+            horizontal=True,
+            key="call_reason"
         )
         
-        notes = st.text_area("Call Notes (Optional)", placeholder="Enter any additional notes")
+        st.text_area("Call Notes (Optional)", placeholder="Enter any additional notes", key="call_notes")
         
-        submitted = st.form_submit_button("Log Call 📝")
-        
-        if submitted and business_name:
-            log_call(business_name, notes, result, reason)
-            st.success("✅ Call logged successfully!")
+        if st.form_submit_button("Log Call 📝", on_click=submit_call_form):
+            if st.session_state.call_logged:
+                st.success("✅ Call logged successfully!")
+            else:
+                st.warning("⚠️ Enter a business name to log this call.")
             
     # Display call log
-    if st.session_state.call_log:
+    if st.session_state.call_log["timestamp"]:
         st.subheader("Recent Calls")
-        df = pd.DataFrame(st.session_state.call_log)
+        table = call_log_table()
         st.dataframe(
-            df,
+            table,
             hide_index=True,
-            column_config={
-                "timestamp": "Time",
-                "business": "Business",
-                "result": "Result",
-                "reason": "Reason",
-                "notes": "Notes"
-            }
+            column_config=CALL_LOG_COLUMNS
         )
         
         # Calculate and display statistics
-        stats = calculate_statistics(df)
+        stats = calculate_statistics()
         if stats:
             st.subheader("Statistics")
             
@@ -368,30 +576,8 @@ with col2:
                 st.write(f"{reason}: {pct:.1f}%")
             
             # Export functionality
-            col1, col2 = st.columns(2)
-            
             current_date = datetime.now(pst).strftime("%Y-%m-%d")
-            
-            # CSV Export
-            with col1:
-                csv_filename = f"call_log_{current_date}.csv"
-                st.download_button(
-                    label="Download Call Log (CSV)",
-                    data=df.to_csv(index=False),
-                    file_name=csv_filename,
-                    mime="text/csv"
-                )
-            
-            # Text Report Export
-            with col2:
-                report_filename = f"call_report_{current_date}.txt"
-                report_text = create_report_text(stats, current_date)
-                st.download_button(
-                    label="Download Report (TXT)",
-                    data=report_text,
-                    file_name=report_filename,
-                    mime="text/plain"
-                )
+            export_section(stats, current_date)
 
 # Footer
 st.markdown("---")